@@ -0,0 +1,192 @@
+"""Shared set-up for the test modules.
+
+Import this before anything imports app: it points app at the test
+database, so it has to set the environment first.
+
+The modules can also be run in parallel with pytest-xdist, e.g.
+``pytest -n 4``; each worker then gets a test database of its own.
+"""
+
+import os
+from unittest import TestCase
+
+from flask import has_request_context
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from models import cache, db, dbx
+
+# what the test modules import from here; CURR_USER_KEY is only passed on
+__all__ = [
+    "app",
+    "CURR_USER_KEY",
+    "TRUNCATE_TABLES",
+    "create_tables",
+    "use_simple_cache",
+    "RolledBackViewTestCase",
+]
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+
+TEST_DATABASE = "warbler_test"
+
+# pytest-xdist names its workers gw0, gw1, ...; give each its own database
+# so they don't empty each other's tables mid-test
+worker = os.environ.get("PYTEST_XDIST_WORKER")
+
+if worker:
+    TEST_DATABASE = f"{TEST_DATABASE}_{worker}"
+
+    # CREATE DATABASE can't run inside a transaction, hence AUTOCOMMIT
+    engine = create_engine(
+        "postgresql:///postgres", isolation_level="AUTOCOMMIT")
+
+    with engine.connect() as conn:
+        exists = conn.scalar(
+            db.text("SELECT 1 FROM pg_database WHERE datname = :name"),
+            {"name": TEST_DATABASE})
+
+        if not exists:
+            conn.execute(db.text(f'CREATE DATABASE "{TEST_DATABASE}"'))
+
+    engine.dispose()
+
+os.environ['DATABASE_URL'] = f"postgresql:///{TEST_DATABASE}"
+os.environ["BCRYPT_LOG_ROUNDS"] = "4"
+os.environ["FLASK_DEBUG"] = "0"
+
+# each process runs its tests one at a time over a local socket, so one
+# pooled connection is enough and needs no ping before every checkout
+os.environ["DATABASE_POOL_PRE_PING"] = "0"
+os.environ["DATABASE_POOL_SIZE"] = "1"
+os.environ["DATABASE_MAX_OVERFLOW"] = "0"
+
+# Now we can import app
+
+from app import app, CURR_USER_KEY
+app.app_context().push()
+
+
+# The app context above outlives every request, so requests would all share
+# one session (and its identity map). Remove it after each request, as
+# ending a request's own app context does outside the tests.
+
+@app.teardown_request
+def remove_session(exc):
+    db.session.remove()
+
+# Create our tables once for the whole test run --- in each test, we'll
+# empty them and create fresh new clean test data
+
+TRUNCATE_TABLES = db.text(
+    "TRUNCATE users, messages, follows, likes RESTART IDENTITY CASCADE")
+
+_tables_created = False
+
+
+def create_tables():
+    """Create fresh tables, the first time any test module asks."""
+
+    global _tables_created
+
+    if _tables_created:
+        return
+
+    # close any transaction an earlier test module left open, or it would
+    # hold locks that block the DDL below
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+    # test data is thrown away, so don't pay for writing it to the WAL; go
+    # child tables first, as a logged table can't reference an unlogged one
+    for table in reversed(db.metadata.sorted_tables):
+        dbx(db.text(f"ALTER TABLE {table.name} SET UNLOGGED"))
+    db.session.commit()
+
+    _tables_created = True
+
+
+# While a request is being handled, make every relationship the app didn't
+# eager-load raise instead of lazy loading, so a route (or its template)
+# that would fire a query per row fails its tests rather than going unseen.
+# Queries the tests run themselves, outside a request, are left alone.
+
+@db.event.listens_for(Session, "do_orm_execute")
+def raise_on_lazy_load(orm_execute_state):
+    """Add raiseload("*") to the app's ORM SELECTs."""
+
+    if (has_request_context()
+            and orm_execute_state.is_select
+            and not orm_execute_state.is_column_load
+            and not orm_execute_state.is_relationship_load):
+        orm_execute_state.statement = (orm_execute_state.statement
+            .options(db.raiseload("*")))
+
+
+def use_simple_cache(test):
+    """Give `test` a real, in-process cache instead of the NullCache."""
+
+    cache.init_app(app, config={"CACHE_TYPE": "SimpleCache"})
+    test.addCleanup(
+        cache.init_app, app, config={"CACHE_TYPE": app.config["CACHE_TYPE"]})
+
+
+class RolledBackViewTestCase(TestCase):
+    """Base for view tests whose changes are never committed.
+
+    Subclasses add their per-class test data in `create_fixtures`.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        dbx(TRUNCATE_TABLES)
+        db.session.commit()
+        db.session.remove()
+
+        # Run the whole class inside one transaction that is never
+        # committed. The session joins it by creating its own SAVEPOINT, so
+        # a commit() (ours or the app's) only releases that SAVEPOINT.
+        cls.engine = db.engines[None]
+        cls.connection = cls.engine.connect()
+        cls.transaction = cls.connection.begin()
+
+        db.engines[None] = cls.connection
+
+        # nothing outside that transaction can change our rows, so don't
+        # expire them on commit and re-SELECT them on the next access
+        db.session.configure(
+            join_transaction_mode="create_savepoint",
+            expire_on_commit=False)
+
+        cls.create_fixtures()
+        db.session.remove()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.transaction.rollback()
+        cls.connection.close()
+
+        db.engines[None] = cls.engine
+        db.session.configure(
+            join_transaction_mode="conditional_savepoint",
+            expire_on_commit=True)
+
+    @classmethod
+    def create_fixtures(cls):
+        """Create the test data every test in the class starts with."""
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+        # each test gets a SAVEPOINT of its own, rolled back in tearDown
+        self.savepoint = self.connection.begin_nested()
+
+    def tearDown(self):
+        db.session.remove()
+        self.savepoint.rollback()
@@ -5,29 +5,66 @@ from flask import (
     Flask, render_template, request, flash, redirect, session, g, abort,
 )
 from flask_debugtoolbar import DebugToolbarExtension
+from flask_session import Session
+from redis import Redis
 from sqlalchemy.exc import IntegrityError
+from werkzeug.local import LocalProxy
 
 from forms import (
     UserAddForm, UserEditForm, LoginForm, MessageForm, CSRFProtection,
 )
 from models import (
-    db, dbx, User, Message, DEFAULT_IMAGE_URL, DEFAULT_HEADER_IMAGE_URL)
+    db, dbx, bcrypt, cache, unknown_username_key, User, Message, Follow,
+    DEFAULT_IMAGE_URL, DEFAULT_HEADER_IMAGE_URL)
 
 load_dotenv()
 
 #for vscode help
 CURR_USER_KEY = "curr_user"
 
+# endpoints that never show the current user, so don't look them up
+ANON_ENDPOINTS = {"static", "signup"}
+
+USERS_PER_PAGE = 50
+
 app = Flask(__name__)
 
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
 app.config['SQLALCHEMY_ECHO'] = False
-app.config['DEBUG_TB_INTERCEPT_REDIRECTS'] = True
-app.config['SQLALCHEMY_RECORD_QUERIES'] = True
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_pre_ping': os.environ.get('DATABASE_POOL_PRE_PING', '1') == '1',
+    'pool_size': int(os.environ.get('DATABASE_POOL_SIZE', 10)),
+    'max_overflow': int(os.environ.get('DATABASE_MAX_OVERFLOW', 20)),
+}
 app.config['SECRET_KEY'] = os.environ['SECRET_KEY']
-toolbar = DebugToolbarExtension(app)
+
+# bcrypt hashing is deliberately slow and runs on the request thread (the
+# C extension releases the GIL while it works); tests turn this down
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+
+# query recording and the toolbar are only useful while developing
+if app.debug:
+    app.config['DEBUG_TB_INTERCEPT_REDIRECTS'] = True
+    app.config['SQLALCHEMY_RECORD_QUERIES'] = True
+    toolbar = DebugToolbarExtension(app)
+
+# keep sessions server-side in Redis when it's available, so the cookie only
+# carries a session id, and cache there too; otherwise fall back to Flask's
+# signed cookies and no caching
+if os.environ.get('REDIS_URL'):
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_REDIS'] = Redis.from_url(os.environ['REDIS_URL'])
+    Session(app)
+
+    app.config['CACHE_TYPE'] = 'RedisCache'
+    app.config['CACHE_REDIS_URL'] = os.environ['REDIS_URL']
+
+else:
+    app.config['CACHE_TYPE'] = 'NullCache'
 
 db.init_app(app)
+bcrypt.init_app(app)
+cache.init_app(app)
 
 
 ##############################################################################
@@ -35,21 +72,32 @@ db.init_app(app)
 
 
 @app.before_request
-def add_user_to_g():
-    """If we're logged in, add curr user to Flask global."""
+def add_user_and_csrf_form_to_g():
+    """Add curr user (if we're logged in) and a CSRF-only form to Flask
+    global, so that every route can use them."""
 
-    if CURR_USER_KEY in session:
-        g.user = db.session.get(User, session[CURR_USER_KEY])
+    user_id = session.get(CURR_USER_KEY)
+
+    if user_id is not None and request.endpoint not in ANON_ENDPOINTS:
+        g.user = db.session.get(User, user_id)
 
     else:
         g.user = None
 
+    # most requests never touch the form, so only build it when used; g is
+    # normally new each request, but not under a test's long-lived app
+    # context, so drop any form a previous request built
+    g.pop("_csrf_form", None)
+    g.csrf_form = LocalProxy(get_csrf_form)
 
-@app.before_request
-def add_csrf_only_form():
-    """Add a CSRF-only form so that every route can use it."""
 
-    g.csrf_form = CSRFProtection()
+def get_csrf_form():
+    """Get this request's CSRF-only form, building it the first time."""
+
+    if "_csrf_form" not in g:
+        g._csrf_form = CSRFProtection()
+
+    return g._csrf_form
 
 
 def do_login(user):
@@ -65,6 +113,20 @@ def do_logout():
         del session[CURR_USER_KEY]
 
 
+def get_page_user_or_404(user_id, *options):
+    """Get the user this page is about, loaded with `options`.
+
+    If that's the current user, load those onto g.user and return it, so
+    the page and the navbar share one object.
+    """
+
+    if user_id == g.user.id:
+        return db.session.get(
+            User, user_id, options=options, populate_existing=True)
+
+    return db.get_or_404(User, user_id, options=options)
+
+
 @app.get('/add-tweet')
 def test_dbcentral():
     user = db.get_or_404(User, 1)
@@ -107,6 +169,10 @@ def signup():
             flash("Username already taken", 'danger')
             return render_template('users/signup.jinja', form=form)
 
+        # only once the user is committed, or a failed login in between
+        # could cache their username as unknown again
+        cache.delete(unknown_username_key(user.username))
+
         do_login(user)
 
         return redirect("/")
@@ -169,11 +235,26 @@ def list_users():
         q = db.select(User).order_by(User.id.desc())
 
     else:
-        q = db.select(User).where(User.username.like(f"%{search}%"))
+        q = (
+            db.select(User)
+            .where(User.username.ilike(f"%{search}%"))
+            .order_by(User.id.desc())
+        )
+
+    pagination = db.paginate(q, per_page=USERS_PER_PAGE)
 
-    users = dbx(q).scalars().all()
+    if g.user:
+        followed_ids = g.user.followed_user_ids(
+            [user.id for user in pagination.items])
+    else:
+        followed_ids = set()
 
-    return render_template('users/index.jinja', users=users)
+    return render_template(
+        'users/index.jinja',
+        users=pagination.items,
+        pagination=pagination,
+        followed_ids=followed_ids,
+    )
 
 
 @app.get('/users/<int:user_id>')
@@ -184,9 +265,20 @@ def show_user(user_id):
         flash("Access unauthorized.", "danger")
         return redirect("/")
 
-    user = db.get_or_404(User, user_id)
+    user = get_page_user_or_404(
+        user_id,
+        db.undefer_group("stats"),
+        db.selectinload(User.messages),
+    )
+
+    # there are no like buttons on the current user's own messages
+    if user is g.user:
+        liked_ids = set()
+    else:
+        liked_ids = g.user.liked_message_ids(
+            [msg.id for msg in user.messages])
 
-    return render_template('users/show.jinja', user=user)
+    return render_template('users/show.jinja', user=user, liked_ids=liked_ids)
 
 
 @app.get('/users/<int:user_id>/following')
@@ -197,9 +289,30 @@ def show_following(user_id):
         flash("Access unauthorized.", "danger")
         return redirect("/")
 
-    user = db.get_or_404(User, user_id)
+    user = get_page_user_or_404(user_id, db.undefer_group("stats"))
 
-    return render_template('users/following.jinja', user=user)
+    q = (
+        db.select(User)
+        .join(Follow, Follow.user_being_followed_id == User.id)
+        .where(Follow.user_following_id == user.id)
+        .order_by(User.id)
+    )
+    pagination = db.paginate(q, per_page=USERS_PER_PAGE)
+
+    # on the current user's own page, they follow everyone listed
+    if user is g.user:
+        followed_ids = {followed.id for followed in pagination.items}
+    else:
+        followed_ids = g.user.followed_user_ids(
+            [followed.id for followed in pagination.items])
+
+    return render_template(
+        'users/following.jinja',
+        user=user,
+        following=pagination.items,
+        pagination=pagination,
+        followed_ids=followed_ids,
+    )
 
 
 @app.get('/users/<int:user_id>/followers')
@@ -210,9 +323,26 @@ def show_followers(user_id):
         flash("Access unauthorized.", "danger")
         return redirect("/")
 
-    user = db.get_or_404(User, user_id)
+    user = get_page_user_or_404(user_id, db.undefer_group("stats"))
+
+    q = (
+        db.select(User)
+        .join(Follow, Follow.user_following_id == User.id)
+        .where(Follow.user_being_followed_id == user.id)
+        .order_by(User.id)
+    )
+    pagination = db.paginate(q, per_page=USERS_PER_PAGE)
+
+    followed_ids = g.user.followed_user_ids(
+        [follower.id for follower in pagination.items])
 
-    return render_template('users/followers.jinja', user=user)
+    return render_template(
+        'users/followers.jinja',
+        user=user,
+        followers=pagination.items,
+        pagination=pagination,
+        followed_ids=followed_ids,
+    )
 
 
 @app.post('/users/follow/<int:follow_id>')
@@ -265,9 +395,18 @@ def show_likes(user_id):
         flash("Access unauthorized.", "danger")
         return redirect("/")
 
-    user = db.session.get(User, user_id)
+    user = get_page_user_or_404(
+        user_id,
+        db.undefer_group("stats"),
+        db.selectinload(User.liked_messages).selectinload(Message.user),
+    )
+
+    # like buttons are only shown on the current user's own likes page,
+    # where every message listed is one they like
+    liked_ids = {msg.id for msg in user.liked_messages}
 
-    return render_template('users/likes.jinja', user=user)
+    return render_template(
+        'users/likes.jinja', user=user, liked_ids=liked_ids)
 
 
 @app.post('/messages/<int:message_id>/like')
@@ -315,7 +454,7 @@ def edit_profile():
     form = UserEditForm(obj=user)
 
     if form.validate_on_submit():
-        if User.authenticate(user.username, form.password.data):
+        if user.has_password(form.password.data):
             user.username = form.username.data
             user.email = form.email.data
             user.image_url = form.image_url.data or DEFAULT_IMAGE_URL
@@ -325,6 +464,7 @@ def edit_profile():
 
             try:
                 db.session.commit()
+                cache.delete(unknown_username_key(user.username))
                 return redirect(f"/users/{user.id}")
 
             except IntegrityError:
@@ -357,9 +497,10 @@ def delete_user():
 
     do_logout()
 
-    q = db.delete(Message).filter_by(user_id=g.user.id)
+    # messages, likes and follows are removed by the database's
+    # ON DELETE CASCADE, so there's no need to load them first
+    q = db.delete(User).filter_by(id=g.user.id)
     dbx(q)
-    db.session.delete(g.user)
     db.session.commit()
 
     return redirect("/signup")
@@ -382,8 +523,8 @@ def add_message():
     form = MessageForm()
 
     if form.validate_on_submit():
-        msg = Message(text=form.text.data)
-        g.user.messages.append(msg)
+        msg = Message(text=form.text.data, user_id=g.user.id)
+        db.session.add(msg)
         db.session.commit()
 
         return redirect(f"/users/{g.user.id}")
@@ -399,8 +540,14 @@ def show_message(message_id):
         flash("Access unauthorized.", "danger")
         return redirect("/")
 
-    msg = db.get_or_404(Message, message_id)
-    return render_template('messages/show.jinja', message=msg)
+    msg = db.get_or_404(
+        Message, message_id, options=[db.joinedload(Message.user)])
+
+    return render_template(
+        'messages/show.jinja',
+        message=msg,
+        liked_ids=g.user.liked_message_ids([msg.id]),
+    )
 
 
 @app.post('/messages/<int:message_id>/delete')
@@ -440,18 +587,32 @@ def homepage():
     """
 
     if g.user:
-        following_ids = [user.id for user in g.user.following] + [g.user.id]
+        # the sidebar shows the current user's stats
+        get_page_user_or_404(g.user.id, db.undefer_group("stats"))
+
+        followed_ids = (
+            db.select(Follow.user_being_followed_id)
+            .where(Follow.user_following_id == g.user.id)
+        )
 
         q = (
             db.select(Message)
-            .where(Message.user_id.in_(following_ids))
+            .where(db.or_(
+                Message.user_id.in_(followed_ids),
+                Message.user_id == g.user.id,
+            ))
+            .options(db.selectinload(Message.user))
             .order_by(Message.timestamp.desc())
             .limit(100)
         )
 
         messages = dbx(q).scalars().all()
 
-        return render_template('home.jinja', messages=messages)
+        return render_template(
+            'home.jinja',
+            messages=messages,
+            liked_ids=g.user.liked_message_ids([msg.id for msg in messages]),
+        )
 
     else:
         return render_template('home-anon.jinja')
@@ -3,9 +3,11 @@
 from datetime import datetime
 
 from flask_bcrypt import Bcrypt
+from flask_caching import Cache
 from flask_sqlalchemy import SQLAlchemy
 
 bcrypt = Bcrypt()
+cache = Cache()
 
 db = SQLAlchemy()
 dbx = db.session.execute
@@ -19,6 +21,15 @@ DEFAULT_HEADER_IMAGE_URL = (
     "rb-4.0.3&ixid=MnwxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8&auto=for" +
     "mat&fit=crop&w=2070&q=80")
 
+# how long (in seconds) to remember that a username doesn't exist
+UNKNOWN_USERNAME_TIMEOUT = 5
+
+
+def unknown_username_key(username):
+    """Cache key recording that no user has `username`."""
+
+    return f"unknown-username:{username}"
+
 
 class Follow(db.Model):
     """Connection of a follower <-> followed_user."""
@@ -27,6 +38,7 @@ class Follow(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint("user_being_followed_id", "user_following_id"),
+        db.Index("ix_follows_following", "user_following_id"),
     )
 
     user_being_followed_id = db.mapped_column(
@@ -61,6 +73,16 @@ class User(db.Model):
 
     __tablename__ = 'users'
 
+    # trigram index so that `username ILIKE '%search%'` doesn't seq-scan
+    __table_args__ = (
+        db.Index(
+            "ix_users_username_trgm",
+            "username",
+            postgresql_using="gin",
+            postgresql_ops={"username": "gin_trgm_ops"},
+        ),
+    )
+
     id = db.mapped_column(
         db.Integer,
         db.Identity(),
@@ -113,6 +135,7 @@ class User(db.Model):
         foreign_keys=[Follow.user_following_id],
         back_populates="followed_user",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     followers_users = db.relationship(
@@ -120,31 +143,44 @@ class User(db.Model):
         foreign_keys=[Follow.user_being_followed_id],
         back_populates="following_user",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     messages = db.relationship(
         "Message",
         back_populates="user",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     likes = db.relationship(
         "Like",
         back_populates="user",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
-    @property
-    def following(self):
-        return [follow.following_user for follow in self.following_users]
+    following = db.relationship(
+        "User",
+        secondary="follows",
+        primaryjoin="User.id == Follow.user_following_id",
+        secondaryjoin="User.id == Follow.user_being_followed_id",
+        viewonly=True,
+    )
 
-    @property
-    def followers(self):
-        return [follow.followed_user for follow in self.followers_users]
+    followers = db.relationship(
+        "User",
+        secondary="follows",
+        primaryjoin="User.id == Follow.user_being_followed_id",
+        secondaryjoin="User.id == Follow.user_following_id",
+        viewonly=True,
+    )
 
-    @property
-    def liked_messages(self):
-        return [db.session.get(Message, like.message_id) for like in self.likes]
+    liked_messages = db.relationship(
+        "Message",
+        secondary="likes",
+        viewonly=True,
+    )
 
     def __repr__(self):
         return f"<User #{self.id}: {self.username}, {self.email}>"
@@ -180,16 +216,32 @@ class User(db.Model):
         False.
         """
 
+        # misses are cached briefly, so bursts of logins with made-up
+        # usernames don't each cost a database round-trip
+        if cache.get(unknown_username_key(username)):
+            return False
+
         q = db.select(cls).filter_by(username=username)
         user = dbx(q).scalar_one_or_none()
 
         if user:
-            is_auth = bcrypt.check_password_hash(user.password, password)
-            if is_auth:
+            if user.has_password(password):
                 return user
 
+        else:
+            cache.set(
+                unknown_username_key(username),
+                True,
+                timeout=UNKNOWN_USERNAME_TIMEOUT,
+            )
+
         return False
 
+    def has_password(self, password):
+        """Does `password` match this user's hashed password?"""
+
+        return bcrypt.check_password_hash(self.password, password)
+
     def follow(self, other_user):
         """Follow another user."""
 
@@ -213,33 +265,82 @@ class User(db.Model):
     def is_followed_by(self, other_user):
         """Is this user followed by `other_user`?"""
 
-        found_user_list = [
-            user for user in self.followers if user == other_user]
-        return len(found_user_list) == 1
+        q = db.select(db.exists().where(
+            Follow.user_being_followed_id == self.id,
+            Follow.user_following_id == other_user.id,
+        ))
+        return db.session.scalar(q)
 
     def is_following(self, other_user):
         """Is this user following `other_user`?"""
 
-        found_user_list = [
-            user for user in self.following if user == other_user]
-        return len(found_user_list) == 1
+        q = db.select(db.exists().where(
+            Follow.user_being_followed_id == other_user.id,
+            Follow.user_following_id == self.id,
+        ))
+        return db.session.scalar(q)
+
+    def followed_user_ids(self, user_ids):
+        """Which of `user_ids` this user follows, for the follow buttons."""
+
+        if not user_ids:
+            return set()
+
+        q = db.select(Follow.user_being_followed_id).where(
+            Follow.user_following_id == self.id,
+            Follow.user_being_followed_id.in_(user_ids),
+        )
+        return set(dbx(q).scalars())
 
     def toggle_like(self, msg):
         """Like or unlike a message."""
 
-        if msg in self.liked_messages:
+        q = db.select(db.exists().where(
+            Like.user_id == self.id,
+            Like.message_id == msg.id,
+        ))
+
+        if db.session.scalar(q):
             q = db.delete(Like).filter_by(user_id=self.id, message_id=msg.id)
             dbx(q)
         else:
             like = Like(user_id=self.id, message_id=msg.id)
             db.session.add(like)
 
+    def liked_message_ids(self, message_ids):
+        """Which of `message_ids` this user likes, for marking like buttons."""
+
+        if not message_ids:
+            return set()
+
+        q = db.select(Like.message_id).where(
+            Like.user_id == self.id,
+            Like.message_id.in_(message_ids),
+        )
+        return set(dbx(q).scalars())
+
+
+db.event.listen(
+    User.__table__,
+    "before_create",
+    db.DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(
+        dialect="postgresql"),
+)
+
 
 class Message(db.Model):
     """An individual message ("warble")."""
 
     __tablename__ = 'messages'
 
+    __table_args__ = (
+        db.Index(
+            "ix_messages_user_timestamp",
+            "user_id",
+            db.text("timestamp DESC"),
+        ),
+    )
+
     id = db.mapped_column(
         db.Integer,
         db.Identity(),
@@ -272,6 +373,7 @@ class Message(db.Model):
         "Like",
         back_populates="message",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
 
@@ -303,3 +405,43 @@ class Like(db.Model):
         "Message",
         back_populates="likes",
     )
+
+
+# counts the profile pages show; deferred, so they're only worked out (as
+# subqueries of the user's own SELECT) when a query asks for them with
+# db.undefer_group("stats")
+
+User.messages_count = db.column_property(
+    db.select(db.func.count(Message.id))
+    .where(Message.user_id == User.id)
+    .scalar_subquery(),
+    deferred=True,
+    group="stats",
+)
+
+User.following_count = db.column_property(
+    db.select(db.func.count())
+    .select_from(Follow)
+    .where(Follow.user_following_id == User.id)
+    .scalar_subquery(),
+    deferred=True,
+    group="stats",
+)
+
+User.followers_count = db.column_property(
+    db.select(db.func.count())
+    .select_from(Follow)
+    .where(Follow.user_being_followed_id == User.id)
+    .scalar_subquery(),
+    deferred=True,
+    group="stats",
+)
+
+User.likes_count = db.column_property(
+    db.select(db.func.count())
+    .select_from(Like)
+    .where(Like.user_id == User.id)
+    .scalar_subquery(),
+    deferred=True,
+    group="stats",
+)
@@ -5,158 +5,147 @@
 #    FLASK_DEBUG=False python -m unittest test_auth_views.py
 
 
-import os
-from unittest import TestCase
+from _test_support import (
+    app, CURR_USER_KEY, RolledBackViewTestCase, create_tables,
+    use_simple_cache)
+from models import cache, db, unknown_username_key, Message, User
 
-from models import db, dbx, Message, User
 
-# BEFORE we import our app, let's set an environmental variable
-# to use a different database for tests (we need to do this
-# before we import our app, since that will have already
-# connected to the database
+def setUpModule():
+    create_tables()
 
-os.environ['DATABASE_URL'] = "postgresql:///warbler_test"
-os.environ["FLASK_DEBUG"] = "0"
-
-# Now we can import app
-
-from app import app, CURR_USER_KEY
-app.app_context().push()
-
-# Create our tables (we do this here, so we only create the tables
-# once for all tests --- in each test, we'll delete the data
-# and create fresh new clean test data
-
-db.create_all()
 
 # Don't have WTForms use CSRF at all, since it's a pain to test
 
 app.config['WTF_CSRF_ENABLED'] = False
 
 
-class AuthViewTestCase(TestCase):
+class AuthViewTestCase(RolledBackViewTestCase):
     def setUp(self):
-        dbx(db.delete(User))
-        db.session.commit()
+        super().setUp()
 
         u1 = User.signup("u1", "u1@email.com", "password", None)
-        db.session.flush()
-
-        m1 = Message(text="m1-text", user_id=u1.id)
-        db.session.add_all([m1])
+        m1 = Message(text="m1-text", user=u1)
+        db.session.add(m1)
         db.session.commit()
 
         self.u1_id = u1.id
         self.m1_id = m1.id
 
-    def tearDown(self):
-        db.session.rollback()
-
     def test_signup_success(self):
-        with app.test_client() as c:
-            resp = c.post(
-                "/signup",
-                data={
-                    "username": "newU",
-                    "password": "password",
-                    "email": "newEmail@email.com",
-                    "image_url": "",
-                },
-                follow_redirects=True)
-
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn("@newU", str(resp.data))
+        resp = self.client.post(
+            "/signup",
+            data={
+                "username": "newU",
+                "password": "password",
+                "email": "newEmail@email.com",
+                "image_url": "",
+            },
+            follow_redirects=True)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"@newU", resp.data)
+
+    def test_signup_forgets_unknown_username(self):
+        use_simple_cache(self)
+
+        self.assertFalse(User.authenticate("newU", "password"))
+        self.assertTrue(cache.get(unknown_username_key("newU")))
+
+        self.client.post(
+            "/signup",
+            data={
+                "username": "newU",
+                "password": "password",
+                "email": "newEmail@email.com",
+                "image_url": "",
+            })
+
+        self.assertIsNone(cache.get(unknown_username_key("newU")))
+        self.assertTrue(User.authenticate("newU", "password"))
 
     def test_signup_dupe_username(self):
-        with app.test_client() as c:
-            resp = c.post(
-                "/signup",
-                data={
-                    "username": "u1",
-                    "password": "password",
-                    "email": "newEmail@email.com",
-                    "image_url": "",
-                },
-                follow_redirects=True)
-
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn("Username already taken", str(resp.data))
+        resp = self.client.post(
+            "/signup",
+            data={
+                "username": "u1",
+                "password": "password",
+                "email": "newEmail@email.com",
+                "image_url": "",
+            },
+            follow_redirects=True)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Username already taken", resp.data)
 
     def test_signup_dupe_email(self):
-        with app.test_client() as c:
-            resp = c.post(
-                "/signup",
-                data={
-                    "username": "newU",
-                    "password": "password",
-                    "email": "u1@email.com",
-                    "image_url": "",
-                },
-                follow_redirects=True)
-
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn("Username already taken", str(resp.data))
+        resp = self.client.post(
+            "/signup",
+            data={
+                "username": "newU",
+                "password": "password",
+                "email": "u1@email.com",
+                "image_url": "",
+            },
+            follow_redirects=True)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Username already taken", resp.data)
 
     def test_login(self):
-        with app.test_client() as c:
-            resp = c.post(
-                "/login",
-                data={
-                    "username": "u1",
-                    "password": "password",
-                },
-                follow_redirects=True)
-
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn("Hello, u1!", str(resp.data))
-            self.assertIn("@u1", str(resp.data))
+        resp = self.client.post(
+            "/login",
+            data={
+                "username": "u1",
+                "password": "password",
+            },
+            follow_redirects=True)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Hello, u1!", resp.data)
+        self.assertIn(b"@u1", resp.data)
 
     def test_login_wrong_password(self):
-        with app.test_client() as c:
-            resp = c.post(
-                "/login",
-                data={
-                    "username": "u1",
-                    "password": "badpassword",
-                },
-                follow_redirects=True)
-
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn("Invalid credentials.", str(resp.data))
-            self.assertIn("Welcome back.", str(resp.data))
+        resp = self.client.post(
+            "/login",
+            data={
+                "username": "u1",
+                "password": "badpassword",
+            },
+            follow_redirects=True)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Invalid credentials.", resp.data)
+        self.assertIn(b"Welcome back.", resp.data)
 
     def test_login_wrong_password_username(self):
-        with app.test_client() as c:
-            resp = c.post(
-                "/login",
-                data={
-                    "username": "badu1",
-                    "password": "badpassword",
-                },
-                follow_redirects=True)
-
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn("Invalid credentials.", str(resp.data))
-            self.assertIn("Welcome back.", str(resp.data))
+        resp = self.client.post(
+            "/login",
+            data={
+                "username": "badu1",
+                "password": "badpassword",
+            },
+            follow_redirects=True)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Invalid credentials.", resp.data)
+        self.assertIn(b"Welcome back.", resp.data)
 
     def test_logout(self):
-        with app.test_client() as c:
-            with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.u1_id
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.u1_id
 
-            resp = c.post(
-                "/logout",
-                follow_redirects=True)
+        resp = self.client.post(
+            "/logout",
+            follow_redirects=True)
 
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn("Welcome back.", str(resp.data))
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Welcome back.", resp.data)
 
     def test_logout_no_authentication(self):
-        with app.test_client() as c:
-
-            resp = c.post(
-                "/logout",
-                follow_redirects=True)
+        resp = self.client.post(
+            "/logout",
+            follow_redirects=True)
 
-            self.assertIn("Access unauthorized.", str(resp.data))
-            self.assertIn("Happening?", str(resp.data))
\ No newline at end of file
+        self.assertIn(b"Access unauthorized.", resp.data)
+        self.assertIn(b"Happening?", resp.data)
\ No newline at end of file
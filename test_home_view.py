@@ -5,30 +5,16 @@
 #    FLASK_DEBUG=False python -m unittest test_home_view.py
 
 
-import os
 from unittest import TestCase
 
-from models import User, db, dbx
+from _test_support import (
+    app, CURR_USER_KEY, TRUNCATE_TABLES, create_tables)
+from models import Follow, Message, User, db, dbx
 
-# BEFORE we import our app, let's set an environmental variable
-# to use a different database for tests (we need to do this
-# before we import our app, since that will have already
-# connected to the database
 
-os.environ['DATABASE_URL'] = "postgresql:///warbler_test"
-os.environ["FLASK_DEBUG"] = "0"
+def setUpModule():
+    create_tables()
 
-# Now we can import app
-
-from app import app, CURR_USER_KEY
-app.app_context().push()
-
-# Create our tables (we do this here, so we only create the tables
-# once for all tests --- in each test, we'll delete the data
-# and create fresh new clean test data
-
-db.drop_all()
-db.create_all()
 
 # Don't have WTForms use CSRF at all, since it's a pain to test
 
@@ -37,8 +23,13 @@ app.config['WTF_CSRF_ENABLED'] = False
 
 class HomeViewTestCase(TestCase):
     def setUp(self):
-        dbx(db.delete(User))
+        self.client = app.test_client()
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+        dbx(TRUNCATE_TABLES)
         db.session.commit()
+        db.session.expunge_all()
 
         u1 = User.signup("u1", "u1@email.com", "password", None)
 
@@ -51,25 +42,45 @@ class HomeViewTestCase(TestCase):
         db.session.rollback()
 
     def test_home_logged_in(self):
-        with app.test_client() as c:
-            with c.session_transaction() as sess:
-                sess[CURR_USER_KEY] = self.u1_id
-            resp = c.get(
-                "/",
-                follow_redirects=True,)
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.u1_id
+        resp = self.client.get(
+            "/",
+            follow_redirects=True,)
 
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn("@u1", str(resp.data))
-            self.assertIn("Log out", str(resp.data))
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"@u1", resp.data)
+        self.assertIn(b"Log out", resp.data)
 
     def test_home_logged_out(self):
-        with app.test_client() as c:
+        resp = self.client.get(
+            "/",
+            follow_redirects=True,)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Sign up", resp.data)
+        self.assertIn(b"Log in", resp.data)
+        self.assertIn(b"Happening?", resp.data)
+
+    def test_home_feed(self):
+        u2 = User.signup("u2", "u2@email.com", "password", None)
+        u3 = User.signup("u3", "u3@email.com", "password", None)
+        db.session.flush()
+
+        f1 = Follow(
+            user_being_followed_id=u2.id,
+            user_following_id=self.u1_id)
+        m1 = Message(text="u1-warble", user_id=self.u1_id)
+        m2 = Message(text="u2-warble", user_id=u2.id)
+        m3 = Message(text="u3-warble", user_id=u3.id)
+        db.session.add_all([f1, m1, m2, m3])
+        db.session.commit()
 
-            resp = c.get(
-                "/",
-                follow_redirects=True,)
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.u1_id
+        resp = self.client.get("/")
 
-            self.assertEqual(resp.status_code, 200)
-            self.assertIn("Sign up", str(resp.data))
-            self.assertIn("Log in", str(resp.data))
-            self.assertIn("Happening?", str(resp.data))
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"u1-warble", resp.data)
+        self.assertIn(b"u2-warble", resp.data)
+        self.assertNotIn(b"u3-warble", resp.data)
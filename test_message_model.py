@@ -5,35 +5,34 @@
 #    python -m unittest test_message_model.py
 
 
-import os
 from unittest import TestCase
 
+from _test_support import TRUNCATE_TABLES, create_tables
 from models import db, dbx, User, Message, Follow, Like
 
-# BEFORE we import our app, let's set an environmental variable
-# to use a different database for tests (we need to do this
-# before we import our app, since that will have already
-# connected to the database
+# the likes by a user; built once and run with each test's user id
+LIKES_BY_USER = (db
+    .select(Like)
+    .where(Like.user_id == db.bindparam("user_id"))
+)
 
-os.environ['DATABASE_URL'] = "postgresql:///warbler_test"
+# and how many there are, for tests that only need the count
+LIKE_COUNT_BY_USER = (db
+    .select(db.func.count())
+    .select_from(Like)
+    .where(Like.user_id == db.bindparam("user_id"))
+)
 
-# Now we can import app
 
-from app import app
-app.app_context().push()
-
-# Create our tables (we do this here, so we only create the tables
-# once for all tests --- in each test, we'll delete the data
-# and create fresh new clean test data
-
-db.drop_all()
-db.create_all()
+def setUpModule():
+    create_tables()
 
 
 class MessageModelTestCase(TestCase):
     def setUp(self):
-        db.drop_all()
-        db.create_all()
+        dbx(TRUNCATE_TABLES)
+        db.session.commit()
+        db.session.expunge_all()
 
         u1 = User.signup("testing", "testing@test.com", "password", None)
         m1 = Message(text="text")
@@ -47,7 +46,12 @@ class MessageModelTestCase(TestCase):
         db.session.rollback()
 
     def test_message_model(self):
-        u = db.session.get(User, self.u1_id)
+        q = (db
+            .select(User)
+            .where(User.id == self.u1_id)
+            .options(db.selectinload(User.messages))
+        )
+        u = dbx(q).scalar_one()
 
         # User should have 1 message
         self.assertEqual(len(u.messages), 1)
@@ -61,8 +65,23 @@ class MessageModelTestCase(TestCase):
         db.session.add_all([m2])
         u.toggle_like(m1)
 
-        q = db.select(Like).where(Like.user_id == u.id)
-        k = dbx(q).scalars().all()
+        k = dbx(LIKES_BY_USER, {"user_id": u.id}).scalars().all()
 
         self.assertEqual(len(k), 1)
         self.assertEqual(k[0].message_id, m1.id)
+
+    def test_message_unlike(self):
+        u = db.session.get(User, self.u1_id)
+        m1 = db.session.get(Message, self.m1_id)
+
+        u.toggle_like(m1)
+        db.session.commit()
+        self.assertEqual(u.liked_messages, [m1])
+
+        u.toggle_like(m1)
+        db.session.commit()
+
+        count = dbx(LIKE_COUNT_BY_USER, {"user_id": u.id}).scalar_one()
+
+        self.assertEqual(count, 0)
+        self.assertEqual(u.liked_messages, [])
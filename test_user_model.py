@@ -5,55 +5,41 @@
 #    python -m unittest test_user_model.py
 
 
-import os
 from sqlalchemy.exc import IntegrityError
 from unittest import TestCase
-from flask_bcrypt import Bcrypt
 
-from models import db, dbx, User
+from _test_support import TRUNCATE_TABLES, create_tables, use_simple_cache
+from models import bcrypt, cache, db, dbx, unknown_username_key, User
 
-# BEFORE we import our app, let's set an environmental variable
-# to use a different database for tests (we need to do this
-# before we import our app, since that will have already
-# connected to the database
-os.environ['DATABASE_URL'] = "postgresql:///warbler_test"
+# hashing is slow on purpose, so hash the test users' password once and
+# share it between tests; the app's bcrypt uses the tests' low work factor
+HASHED_PASSWORD = (bcrypt
+    .generate_password_hash("password")
+    .decode('UTF-8')
+)
 
-# Now we can import app
-from app import app
-app.app_context().push()
 
-# instantiate Bcrypt to create hashed passwords for test data
-bcrypt = Bcrypt()
-
-# Create our tables (we do this here, so we only create the tables
-# once for all tests --- in each test, we'll delete the data
-# and create fresh new clean test data
-
-db.drop_all()
-db.create_all()
+def setUpModule():
+    create_tables()
 
 
 class UserModelTestCase(TestCase):
     def setUp(self):
-        dbx(db.delete(User))
+        dbx(TRUNCATE_TABLES)
         db.session.commit()
-
-        hashed_password = (bcrypt
-            .generate_password_hash("password")
-            .decode('UTF-8')
-        )
+        db.session.expunge_all()
 
         u1 = User(
             username="u1",
             email="u1@email.com",
-            password=hashed_password,
+            password=HASHED_PASSWORD,
             image_url=None,
         )
 
         u2 = User(
             username="u2",
             email="u2@email.com",
-            password=hashed_password,
+            password=HASHED_PASSWORD,
             image_url=None,
         )
 
@@ -67,7 +53,14 @@ class UserModelTestCase(TestCase):
         db.session.rollback()
 
     def test_user_model(self):
-        u1 = db.session.get(User, self.u1_id)
+        q = (db
+            .select(User)
+            .where(User.id == self.u1_id)
+            .options(
+                db.selectinload(User.messages),
+                db.selectinload(User.followers))
+        )
+        u1 = dbx(q).scalar_one()
 
         # User should have no messages & no followers
         self.assertEqual(len(u1.messages), 0)
@@ -137,3 +130,27 @@ class UserModelTestCase(TestCase):
 
     def test_wrong_password(self):
         self.assertFalse(User.authenticate("u1", "bad-password"))
+
+    def test_has_password(self):
+        u1 = db.session.get(User, self.u1_id)
+        self.assertTrue(u1.has_password("password"))
+        self.assertFalse(u1.has_password("bad-password"))
+
+    def test_unknown_username_cached(self):
+        use_simple_cache(self)
+
+        self.assertFalse(User.authenticate("u3", "password"))
+        self.assertTrue(cache.get(unknown_username_key("u3")))
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        db.event.listen(db.engine, "before_cursor_execute", record)
+        self.addCleanup(
+            db.event.remove, db.engine, "before_cursor_execute", record)
+
+        # the second attempt is answered from the cache
+        self.assertFalse(User.authenticate("u3", "password"))
+        self.assertEqual(statements, [])